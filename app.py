@@ -1,132 +1,14 @@
 import streamlit as st
-import numpy as np
-import os
-import json
-import io
-import re
-
-# ── PDF extraction ──────────────────────────────────────────
-def extract_text_from_pdf(file_bytes: bytes) -> str:
-    try:
-        from PyPDF2 import PdfReader
-        reader = PdfReader(io.BytesIO(file_bytes))
-        text = ""
-        for page in reader.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
-        return text.strip()
-    except Exception as e:
-        return ""
-
-def extract_text_from_txt(file_bytes: bytes) -> str:
-    return file_bytes.decode("utf-8", errors="ignore").strip()
-
-# ── Text helpers ────────────────────────────────────────────
-def clean_text(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r"[^a-z\s]", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
-def truncate_text(text: str, max_words: int = 512) -> str:
-    words = text.split()
-    return " ".join(words[:max_words]) if len(words) > max_words else text
-
-def preprocess(text: str) -> str:
-    return truncate_text(clean_text(text))
-
-# ── Embedder (cached so model loads only once) ──────────────
-@st.cache_resource(show_spinner="Loading AI model...")
-def get_model():
-    from sentence_transformers import SentenceTransformer
-    return SentenceTransformer("all-MiniLM-L6-v2")
-
-def embed_text(text: str) -> np.ndarray:
-    model = get_model()
-    return model.encode([text])[0].astype(np.float32)
-
-# ── In-memory vector store (persists during session) ────────
-DIMENSION = 384
-MIN_SCORE = 0.4
-
-def _init_store():
-    if "faiss_index" not in st.session_state:
-        import faiss
-        st.session_state.faiss_index = faiss.IndexFlatL2(DIMENSION)
-        st.session_state.resume_meta = []
-
-def add_resume(filename: str, text: str, embedding: np.ndarray):
-    import faiss
-    _init_store()
-    vec = np.array([embedding], dtype=np.float32)
-    st.session_state.faiss_index.add(vec)
-    st.session_state.resume_meta.append({
-        "id": st.session_state.faiss_index.ntotal - 1,
-        "filename": filename,
-        "text": text[:1000]
-    })
-
-def search_resumes(query_embedding: np.ndarray, top_k: int = 10):
-    _init_store()
-    index = st.session_state.faiss_index
-    meta = st.session_state.resume_meta
-
-    if index.ntotal == 0:
-        return []
-
-    vec = np.array([query_embedding], dtype=np.float32)
-    search_k = min(top_k * 5, index.ntotal)
-    distances, indices = index.search(vec, search_k)
-
-    results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        if idx < len(meta):
-            score = round(float(1 / (1 + dist)), 4)
-            if score >= MIN_SCORE:
-                entry = meta[idx].copy()
-                entry["score"] = score
-                results.append(entry)
-            if len(results) >= top_k:
-                break
-
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results
-
-def get_all_resumes():
-    _init_store()
-    return st.session_state.resume_meta
-
-def delete_resume(filename: str):
-    import faiss
-    _init_store()
-    meta = st.session_state.resume_meta
-    new_meta = [m for m in meta if m["filename"] != filename]
-    if len(new_meta) == len(meta):
-        return False
-
-    new_index = faiss.IndexFlatL2(DIMENSION)
-    updated_meta = []
-    for i, entry in enumerate(new_meta):
-        vec = np.array([embed_text(entry["text"])], dtype=np.float32)
-        new_index.add(vec)
-        entry["id"] = i
-        updated_meta.append(entry)
-
-    st.session_state.faiss_index = new_index
-    st.session_state.resume_meta = updated_meta
-    return True
-
-def clear_all():
-    import faiss
-    st.session_state.faiss_index = faiss.IndexFlatL2(DIMENSION)
-    st.session_state.resume_meta = []
+from embedder import embed_text
+from pdf_extractor import extract_text_from_pdf, extract_text_from_txt
+from helpers import preprocess
+from vector_store import add_resume, search_resumes, get_all_resumes, delete_resume, clear_all, flush, load
 
 # ── UI ──────────────────────────────────────────────────────
 st.set_page_config(page_title="Resume Semantic Search", page_icon="🔍")
 st.title("🔍 Resume Semantic Search")
 
-_init_store()
+load()
 
 tab1, tab2, tab3 = st.tabs([
     "👤 Candidate — Upload Resume",
@@ -152,10 +34,13 @@ with tab1:
             else:
                 with st.spinner("Processing resume..."):
                     content = resume_file.read()
-                    if resume_file.name.endswith(".pdf"):
-                        text = extract_text_from_pdf(content)
-                    else:
-                        text = extract_text_from_txt(content)
+                    try:
+                        if resume_file.name.endswith(".pdf"):
+                            text = extract_text_from_pdf(content)
+                        else:
+                            text = extract_text_from_txt(content)
+                    except Exception:
+                        text = ""
 
                     if not text.strip():
                         st.error("Could not extract text from resume. Please try a different file.")
@@ -163,6 +48,7 @@ with tab1:
                         clean = preprocess(text)
                         embedding = embed_text(clean)
                         add_resume(resume_file.name, text, embedding)
+                        flush()
                         st.success(f"✅ Resume '{resume_file.name}' submitted! Recruiters can now find you.")
 
 # ── TAB 2: RECRUITER ────────────────────────────────────────
@@ -180,7 +66,7 @@ with tab2:
     if st.button("Find Top Candidates"):
         if not query.strip():
             st.warning("Please enter a job description.")
-        elif st.session_state.faiss_index.ntotal == 0:
+        elif not get_all_resumes():
             st.warning("No resumes in the system yet. Ask candidates to upload their resumes first.")
         else:
             with st.spinner("Searching candidates..."):
@@ -247,4 +133,5 @@ with tab3:
                 if st.button("Delete", key=f"del_{r['filename']}"):
                     with st.spinner("Deleting..."):
                         delete_resume(r["filename"])
+                        flush()
                     st.rerun()
@@ -1,10 +1,131 @@
-from sentence_transformers import SentenceTransformer
+import functools
 import numpy as np
+import os
+import embedding_cache
 
-_model = SentenceTransformer("all-MiniLM-L6-v2")
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DIMENSION = 384
+# Quantized model produced by:
+#   optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 --task feature-extraction onnx_model/
+#   optimum-cli onnxruntime quantize --onnx_model onnx_model --output onnx_int8 --avx512_vnni
+ONNX_MODEL_DIR = os.environ.get("EMBEDDER_ONNX_DIR", "onnx_int8")
+MAX_SEQ_LENGTH = 256
 
-def embed_text(text: str) -> np.ndarray:
-    return _model.encode([text])[0].astype(np.float32)
+def _cpu_flags() -> set:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
 
-def embed_texts(texts: list) -> np.ndarray:
-    return _model.encode(texts).astype(np.float32)
+class _OnnxEncoder:
+    """Dynamic INT8 MiniLM on ONNX Runtime, mean-pooled like SentenceTransformer"""
+
+    variant = "onnx-int8"
+
+    def __init__(self, path: str):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        # The quantize step only writes the model, so take the tokenizer from the hub model
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(path, provider="CPUExecutionProvider")
+
+    def encode(self, texts: list, batch_size: int) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[i:i + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            hidden = self.model(**tokens).last_hidden_state
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            out.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        vecs = np.vstack(out).astype(np.float32)
+        vecs /= np.clip(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12, None)
+        return vecs
+
+class _TorchEncoder:
+    """MiniLM on PyTorch with manual mean pooling, under BF16 autocast on CPUs with AMX"""
+
+    def __init__(self, bf16: bool):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        torch.set_num_threads(int(os.environ.get("OMP_NUM_THREADS", os.cpu_count())))
+        try:
+            # Batches are one large op each; inter-op threads only oversubscribe
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Already fixed once torch has started parallel work
+            pass
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self.model = AutoModel.from_pretrained(MODEL_NAME).eval()
+        self.bf16 = bf16
+        self.variant = "torch-bf16" if bf16 else "torch-fp32"
+
+    def encode(self, texts: list, batch_size: int) -> np.ndarray:
+        import torch
+        out = []
+        with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            for i in range(0, len(texts), batch_size):
+                tokens = self.tokenizer(
+                    texts[i:i + batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=MAX_SEQ_LENGTH,
+                    return_tensors="pt",
+                )
+                hidden = self.model(**tokens).last_hidden_state.float()
+                mask = tokens["attention_mask"].unsqueeze(-1).float()
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+                out.append(torch.nn.functional.normalize(pooled, dim=1))
+        return torch.cat(out).cpu().numpy().astype(np.float32, copy=False)
+
+@functools.lru_cache(maxsize=1)
+def _get_model():
+    """Load the encoder on first use so importing this module stays cheap"""
+    # INT8 dequant overhead makes ONNX slower than BF16 on AMX parts,
+    # so only use the quantized model on VNNI/AVX CPUs without AMX
+    flags = _cpu_flags()
+    has_amx = "amx_bf16" in flags
+    if not has_amx and os.path.isdir(ONNX_MODEL_DIR):
+        try:
+            return _OnnxEncoder(ONNX_MODEL_DIR)
+        except (ImportError, OSError):
+            pass
+    return _TorchEncoder(bf16=has_amx)
+
+def _encode(texts: list, batch_size: int = 32) -> np.ndarray:
+    # Embeddings are L2-normalized so inner product == cosine similarity
+    return _get_model().encode(texts, batch_size)
+
+def embed_text(text: str, cache: bool = False) -> np.ndarray:
+    """Embed one text; cache=True reuses and stores the vector on disk by content hash"""
+    if not cache:
+        return _encode([text])[0]
+    return embedding_cache.get_or_compute(text, lambda t: _encode([t])[0], _get_model().variant)
+
+def embed_texts(texts: list, batch_size: int = 32, cache: bool = False) -> np.ndarray:
+    """Embed many texts in batches, grouped by length to minimise padding"""
+    if not texts:
+        return np.empty((0, DIMENSION), dtype=np.float32)
+    vecs = [None] * len(texts)
+    if cache:
+        variant = _get_model().variant
+        keys = [embedding_cache.text_hash(t, variant) for t in texts]
+        vecs = [embedding_cache.load(k) for k in keys]
+    missing = [i for i, vec in enumerate(vecs) if vec is None]
+
+    if missing:
+        missing.sort(key=lambda i: len(texts[i].split()))
+        computed = _encode([texts[i] for i in missing], batch_size)
+        for i, vec in zip(missing, computed):
+            if cache:
+                embedding_cache.save(keys[i], vec)
+            vecs[i] = vec
+    return np.vstack(vecs).astype(np.float32, copy=False)
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+
+CACHE_DIR = os.path.join(".cache", "emb")
+
+def text_hash(text: str, variant: str = "") -> str:
+    """Key for text's embedding; variant names the encoder so their vectors never mix"""
+    return hashlib.blake2b(f"{variant}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+def _path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.npy")
+
+def load(key: str):
+    """Return the cached embedding for key, or None"""
+    path = _path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        return None
+
+def save(key: str, embedding: np.ndarray):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Unique temp file so concurrent writers of the same key don't collide
+    with tempfile.NamedTemporaryFile(dir=CACHE_DIR, suffix=".tmp", delete=False) as f:
+        np.save(f, np.asarray(embedding, dtype=np.float32))
+    os.replace(f.name, _path(key))
+
+def clear():
+    """Remove every cached embedding"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+def get_or_compute(text: str, compute, variant: str = "") -> np.ndarray:
+    """Look up text's embedding by content hash, computing and storing it on a miss"""
+    key = text_hash(text, variant)
+    embedding = load(key)
+    if embedding is None:
+        embedding = compute(text)
+        save(key, embedding)
+    return embedding
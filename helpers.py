@@ -1,15 +1,21 @@
-import re
+try:
+    # Linear-time DFA engine, if google-re2 is installed
+    import re2 as re
+except ImportError:
+    import re
+
+# Any run of non-letters (whitespace included) collapses to a single space
+_NON_ALPHA = re.compile(r"[^a-z]+")
 
 def clean_text(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r"[^a-z\s]", " ", text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+    return _NON_ALPHA.sub(" ", text.lower()).strip()
 
 def truncate_text(text: str, max_words: int = 512) -> str:
-    words = text.split()
+    # Split off at most max_words words, then slice the original string
+    # instead of re-joining them; the unsplit tail is the last element
+    words = text.split(None, max_words)
     if len(words) > max_words:
-        return " ".join(words[:max_words])
+        return text[:len(text) - len(words[-1])].rstrip()
     return text
 
 def preprocess(text: str, max_words: int = 512) -> str:
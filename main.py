@@ -1,9 +1,31 @@
+import os
+
+# Torch and FAISS both use OpenMP; give each the full core count before
+# either library is imported, and run only one of them at a time
+_THREADS = str(os.cpu_count())
+os.environ.setdefault("OMP_NUM_THREADS", _THREADS)
+os.environ.setdefault("MKL_NUM_THREADS", _THREADS)
+
+import asyncio
+import faiss
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from embedder import embed_text
+from embedder import embed_text, embed_texts
 from pdf_extractor import extract_text_from_pdf, extract_text_from_txt
 from helpers import preprocess
-from vector_store import add_resume, search_resumes, get_all_resumes, delete_resume, clear_all
+from vector_store import add_resume, add_resumes, search_resumes, get_all_resumes, delete_resume, clear_all, flush, load
+
+FLUSH_INTERVAL = 30  # Seconds between background saves of the vector store
+
+logger = logging.getLogger(__name__)
+
+faiss.omp_set_num_threads(int(os.environ["OMP_NUM_THREADS"]))
+
+# Embedding already uses every core, so concurrent requests take turns
+_embed_lock = asyncio.Semaphore(1)
 
 app = FastAPI(title="Resume Semantic Search API")
 
@@ -14,6 +36,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _extract_text(filename: str, content: bytes) -> str:
+    if filename.endswith(".pdf"):
+        return extract_text_from_pdf(content)
+    return extract_text_from_txt(content)
+
+async def _flush_periodically():
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(flush)
+        except Exception:
+            # Keep the loop alive so the next interval retries the save
+            logger.exception("Periodic vector store flush failed")
+
+@app.on_event("startup")
+async def start_flusher():
+    # Extraction and embedding run in threads; cap them at one per core
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=os.cpu_count()))
+    await asyncio.to_thread(load)
+    app.state.flusher = asyncio.create_task(_flush_periodically())
+
+@app.on_event("shutdown")
+async def stop_flusher():
+    app.state.flusher.cancel()
+    await asyncio.to_thread(flush)
+
 @app.get("/")
 def home():
     return {"message": "Resume Semantic Search API running"}
@@ -22,26 +70,55 @@ def home():
 async def submit_resume(file: UploadFile = File(...)):
     """Candidate submits resume"""
     content = await file.read()
-    if file.filename.endswith(".pdf"):
-        text = extract_text_from_pdf(content)
-    else:
-        text = extract_text_from_txt(content)
+    text = await asyncio.to_thread(_extract_text, file.filename, content)
 
     if not text.strip():
         raise HTTPException(status_code=400, detail="Could not extract text from resume")
 
     clean = preprocess(text)
-    embedding = embed_text(clean)
-    add_resume(file.filename, text, embedding)
+    async with _embed_lock:
+        embedding = await asyncio.to_thread(embed_text, clean)
+    # Adds can trigger a flush of the whole index, so keep them off the loop too
+    await asyncio.to_thread(add_resume, file.filename, text, embedding)
 
     return {"message": "Resume submitted successfully", "filename": file.filename}
 
+@app.post("/submit-resumes")
+async def submit_resumes(files: List[UploadFile] = File(...)):
+    """Submit several resumes, embedded and indexed in one batch"""
+    filenames, texts, skipped = [], [], []
+    for file in files:
+        content = await file.read()
+        try:
+            text = await asyncio.to_thread(_extract_text, file.filename, content)
+        except Exception:
+            # One corrupt upload shouldn't fail the rest of the batch
+            logger.warning("Could not extract text from %s", file.filename, exc_info=True)
+            skipped.append(file.filename)
+            continue
+
+        if not text.strip():
+            skipped.append(file.filename)
+            continue
+        filenames.append(file.filename)
+        texts.append(text)
+
+    if not texts:
+        raise HTTPException(status_code=400, detail="Could not extract text from any resume")
+
+    async with _embed_lock:
+        embeddings = await asyncio.to_thread(embed_texts, [preprocess(t) for t in texts])
+    await asyncio.to_thread(add_resumes, filenames, texts, embeddings)
+
+    return {"message": "Resumes submitted successfully", "filenames": filenames, "skipped": skipped}
+
 @app.post("/search")
-def search(query: str = Form(...), top_k: int = Form(10)):
+async def search(query: str = Form(...), top_k: int = Form(10)):
     """Search resumes by semantic similarity to job description"""
     clean_query = preprocess(query)
-    query_embedding = embed_text(clean_query)
-    results = search_resumes(query_embedding, top_k=top_k)
+    async with _embed_lock:
+        query_embedding = await asyncio.to_thread(embed_text, clean_query)
+    results = await asyncio.to_thread(search_resumes, query_embedding, top_k)
     
     return {
         "query": query, 
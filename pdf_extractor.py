@@ -1,14 +1,21 @@
-from PyPDF2 import PdfReader
-import io
+import threading
+import pypdfium2 as pdfium
+
+# PDFium is not thread-safe, even across separate documents
+_pdfium_lock = threading.Lock()
 
 def extract_text_from_pdf(file_bytes: bytes) -> str:
-    reader = PdfReader(io.BytesIO(file_bytes))
-    text = ""
-    for page in reader.pages:
-        extracted = page.extract_text()
-        if extracted:
-            text += extracted + "\n"
-    return text.strip()
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_bytes)
+        try:
+            pages = []
+            for page in pdf:
+                extracted = page.get_textpage().get_text_range()
+                if extracted:
+                    pages.append(extracted)
+            return "\n".join(pages).strip()
+        finally:
+            pdf.close()
 
 def extract_text_from_txt(file_bytes: bytes) -> str:
-    return file_bytes.decode("utf-8").strip()
+    return file_bytes.decode("utf-8", errors="ignore").strip()
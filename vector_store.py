@@ -1,123 +1,395 @@
 import faiss
 import numpy as np
-import json
+import orjson
 import os
+import threading
+import embedding_cache
 
 INDEX_FILE = "resume_index.faiss"
 META_FILE = "resume_meta.json"
+META_LOG_FILE = "meta_log.jsonl"
+FLUSH_EVERY = 50  # Persist after this many unsaved adds
 DIMENSION = 384
-MIN_SCORE = 0.4  # Only return resumes with 40%+ relevance
+# Cosine cutoff; matches the old 1/(1+L2 distance) cutoff of 0.4 on unit vectors
+MIN_SCORE = 0.25
+# Switch from exact search to an IVF index once the pool is this large
+USE_IVF = os.environ.get("VECTOR_STORE_USE_IVF", "1") == "1"
+IVF_THRESHOLD = 10_000
 
+# Guards all store state; FastAPI serves from both the event loop and its
+# threadpool, and Streamlit sessions share this module
+_lock = threading.RLock()
 _index = None
-_meta = []
+_dirty = False
+_compact = False  # Meta needs a full rewrite rather than a log append
+_pending = []  # Meta entries added since the last flush
+_gpu_res = None
+_gpu_index = None
+_gpu_removed = 0  # Deleted vectors still present in the GPU copy
+GPU_REBUILD_FRACTION = 0.1  # Rebuild the GPU copy once this share of it is deleted
+GPU_MAX_K = 2048  # Largest k FAISS GPU indexes accept
+GPU_MAX_STALE = 1024  # ...or once this many deleted vectors pile up
+_promoting = False  # An IVF promotion is training in the background
+
+# Resume meta is kept as parallel columns; rows [0, _n) are live, sorted by id
+_CHUNK = 1024
+_n = 0
+_ids = np.empty(0, dtype=np.int64)
+_filenames = np.empty(0, dtype=object)
+_texts = np.empty(0, dtype=object)
+_meta_loaded = False
+# Ids are never reused: the GPU copy keeps deleted vectors under their old
+# ids, so a recycled id would resolve a stale vector to a new resume
+_next_free_id = 0
+
+def _new_index():
+    # Vectors are stored as FP16 to halve memory and scan bandwidth; FP16
+    # needs no training statistics. IDMap lets us remove single vectors
+    # without rebuilding the index
+    storage = faiss.IndexScalarQuantizer(DIMENSION, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+    return faiss.IndexIDMap2(storage)
+
+def _is_legacy(index) -> bool:
+    # Indexes written before resumes had stable ids were a bare IndexFlatL2
+    return (
+        not isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+        or index.metric_type != faiss.METRIC_INNER_PRODUCT
+    )
+
+def _migrate_legacy_index(legacy):
+    """Copy a legacy index's vectors into the current layout, keyed by meta id"""
+    _load_meta()
+    # Legacy meta ids were the vectors' positions in the index
+    if legacy.ntotal != _n or (_n and int(_ids[_n - 1]) >= legacy.ntotal):
+        raise RuntimeError(
+            f"{INDEX_FILE} holds {legacy.ntotal} vectors but {META_FILE} lists {_n} resumes; "
+            "clear the store and re-upload the resumes"
+        )
+    index = _new_index()
+    if _n:
+        vecs = legacy.reconstruct_n(0, legacy.ntotal)
+        # SentenceTransformer already normalized these; renormalize to be safe
+        faiss.normalize_L2(vecs)
+        index.add_with_ids(vecs[_ids[:_n]], _ids[:_n].copy())
+    return index
 
 def _get_index():
     global _index
     if _index is None:
         if os.path.exists(INDEX_FILE):
             _index = faiss.read_index(INDEX_FILE)
+            if _is_legacy(_index):
+                _index = _migrate_legacy_index(_index)
+                _mark_dirty()
         else:
-            _index = faiss.IndexFlatL2(DIMENSION)
+            _index = _new_index()
     return _index
 
-def _get_meta():
-    global _meta
-    if not _meta and os.path.exists(META_FILE):
-        with open(META_FILE, "r") as f:
-            _meta = json.load(f)
-    return _meta
+def _decode(index):
+    """Stored vectors and ids of an IDMap-wrapped exact index"""
+    return index.index.reconstruct_n(0, index.ntotal), faiss.vector_to_array(index.id_map)
+
+def _maybe_promote_index():
+    """Start an IVF promotion in the background once the index crosses IVF_THRESHOLD"""
+    global _promoting
+    index = _get_index()
+    if not USE_IVF or _promoting or index.ntotal < IVF_THRESHOLD or isinstance(index, faiss.IndexIVF):
+        return
+    _promoting = True
+    threading.Thread(target=_promote_index, daemon=True).start()
+
+def _promote_index():
+    """Train an IVF index on a snapshot off the request path, then swap it in"""
+    global _index, _promoting
+    try:
+        with _lock:
+            train_vecs, _ = _decode(_get_index())
+        # FAISS wants at least 39 training points per list
+        nlist = max(1, min(int(4 * np.sqrt(len(train_vecs))), len(train_vecs) // 39))
+        # IVF indexes take ids natively and support remove_ids, so no IDMap wrapper
+        ivf = faiss.IndexIVFScalarQuantizer(
+            faiss.IndexFlatIP(DIMENSION), DIMENSION, nlist,
+            faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        )
+        ivf.train(train_vecs)
+        ivf.nprobe = max(1, min(16, nlist // 4))
+
+        with _lock:
+            index = _get_index()
+            # The store may have been cleared or promoted while we trained
+            if isinstance(index, faiss.IndexIVF) or index.ntotal < IVF_THRESHOLD:
+                return
+            # Add the current contents, which include any changes made during training
+            ivf.add_with_ids(*_decode(index))
+            _index = ivf
+            _index_changed()
+            _mark_dirty([])
+    finally:
+        with _lock:
+            _promoting = False
+
+def _use_gpu() -> bool:
+    return hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0
+
+def _to_gpu(index):
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.index_cpu_to_gpu(_gpu_res, 0, index)
+    # FAISS has no GPU flat scalar-quantizer index, so decode into a flat
+    # index and let the cloner store it as FP16 on the device
+    flat = faiss.IndexIDMap2(faiss.IndexFlatIP(DIMENSION))
+    if index.ntotal:
+        flat.add_with_ids(index.index.reconstruct_n(0, index.ntotal), faiss.vector_to_array(index.id_map))
+    options = faiss.GpuClonerOptions()
+    options.useFloat16 = True
+    return faiss.index_cpu_to_gpu(_gpu_res, 0, flat, options)
+
+def _get_search_index():
+    """GPU copy of the index for queries; the CPU index stays the source of truth"""
+    global _gpu_res, _gpu_index, _gpu_removed
+    if not _use_gpu():
+        return _get_index()
+    if _gpu_index is None:
+        if _gpu_res is None:
+            _gpu_res = faiss.StandardGpuResources()
+        _gpu_index = _to_gpu(_get_index())
+        _gpu_removed = 0
+    return _gpu_index
+
+def _index_changed():
+    """Drop the GPU copy after the CPU index was replaced wholesale"""
+    global _gpu_index
+    _gpu_index = None
+
+def _gpu_add(vecs: np.ndarray, ids: np.ndarray):
+    if _gpu_index is not None:
+        _gpu_index.add_with_ids(vecs, ids)
+
+def _gpu_remove(count: int):
+    # GPU indexes can't remove vectors; deleted ids are dropped from meta,
+    # so search over-fetches and skips them until the copy is rebuilt
+    global _gpu_index, _gpu_removed
+    if _gpu_index is None:
+        return
+    _gpu_removed += count
+    if _gpu_removed > min(GPU_REBUILD_FRACTION * _gpu_index.ntotal, GPU_MAX_STALE):
+        _gpu_index = None
+
+def _grow(extra: int):
+    """Make room for extra rows, growing the columns in whole chunks"""
+    global _ids, _filenames, _texts
+    need = _n + extra
+    if need <= len(_ids):
+        return
+    capacity = -(-need // _CHUNK) * _CHUNK
+    columns = []
+    for column in (_ids, _filenames, _texts):
+        grown = np.empty(capacity, dtype=column.dtype)
+        grown[:_n] = column[:_n]
+        columns.append(grown)
+    _ids, _filenames, _texts = columns
+
+def _append_rows(entries: list):
+    global _n
+    _grow(len(entries))
+    for i, entry in enumerate(entries, _n):
+        _ids[i] = entry["id"]
+        _filenames[i] = entry["filename"]
+        _texts[i] = entry["text"]
+    _n += len(entries)
 
-def _save_index():
-    faiss.write_index(_get_index(), INDEX_FILE)
+def _entries(rows=None) -> list:
+    if rows is None:
+        rows = range(_n)
+    return [{
+        "id": int(_ids[i]),
+        "filename": _filenames[i],
+        "text": _texts[i]
+    } for i in rows]
 
-def _save_meta():
-    with open(META_FILE, "w") as f:
-        json.dump(_get_meta(), f, indent=2)
+def _load_meta():
+    global _meta_loaded, _next_free_id
+    if _meta_loaded:
+        return
+    _meta_loaded = True
+    entries = []
+    if os.path.exists(META_FILE):
+        with open(META_FILE, "rb") as f:
+            snapshot = orjson.loads(f.read())
+        # Older snapshots are a bare list of entries with no id counter
+        if isinstance(snapshot, dict):
+            entries = snapshot["resumes"]
+            _next_free_id = snapshot["next_id"]
+        else:
+            entries = snapshot
+    if os.path.exists(META_LOG_FILE):
+        with open(META_LOG_FILE, "rb") as f:
+            entries.extend(orjson.loads(line) for line in f if line.strip())
+    entries.sort(key=lambda m: m["id"])
+    _append_rows(entries)
+    if _n:
+        _next_free_id = max(_next_free_id, int(_ids[_n - 1]) + 1)
+
+def _allocate_ids(count: int) -> np.ndarray:
+    global _next_free_id
+    _load_meta()
+    ids = np.arange(_next_free_id, _next_free_id + count, dtype="int64")
+    _next_free_id += count
+    return ids
+
+def _mark_dirty(added=None):
+    """Record a change; new entries are appended to the meta log, removals force a rewrite"""
+    global _dirty, _compact
+    _dirty = True
+    if added is None:
+        _compact = True
+        _pending.clear()
+    else:
+        _pending.extend(added)
+        if len(_pending) >= FLUSH_EVERY:
+            flush()
+
+def load():
+    """Read the store from disk, migrating legacy index files; call at startup"""
+    with _lock:
+        _get_index()
+        _load_meta()
+
+def flush():
+    """Write unsaved index and meta changes to disk"""
+    global _dirty, _compact
+    with _lock:
+        if not _dirty:
+            return
+        faiss.write_index(_get_index(), INDEX_FILE)
+        if _compact:
+            with open(META_FILE, "wb") as f:
+                f.write(orjson.dumps({"next_id": _next_free_id, "resumes": _entries()}))
+            if os.path.exists(META_LOG_FILE):
+                os.remove(META_LOG_FILE)
+        elif _pending:
+            with open(META_LOG_FILE, "ab") as f:
+                f.write(b"".join(orjson.dumps(entry) + b"\n" for entry in _pending))
+        _pending.clear()
+        _dirty = False
+        _compact = False
 
 def add_resume(filename: str, text: str, embedding: np.ndarray):
     """Add resume to vector store"""
-    index = _get_index()
-    meta = _get_meta()
-    vec = np.array([embedding], dtype=np.float32)
-    index.add(vec)
-    meta.append({
-        "id": index.ntotal - 1,
-        "filename": filename,
-        "text": text[:1000]
-    })
-    _save_index()
-    _save_meta()
+    with _lock:
+        index = _get_index()
+        vec = np.array([embedding], dtype=np.float32)
+        ids = _allocate_ids(1)
+        resume_id = int(ids[0])
+        index.add_with_ids(vec, ids)
+        _gpu_add(vec, ids)
+        entry = {
+            "id": resume_id,
+            "filename": filename,
+            "text": text[:1000]
+        }
+        _append_rows([entry])
+        _maybe_promote_index()
+        _mark_dirty([entry])
+
+def add_resumes(filenames: list, texts: list, embeddings: np.ndarray):
+    """Add several resumes to vector store with a single index update"""
+    with _lock:
+        index = _get_index()
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        ids = _allocate_ids(len(filenames))
+        index.add_with_ids(vecs, ids)
+        _gpu_add(vecs, ids)
+        added = [{
+            "id": int(resume_id),
+            "filename": filename,
+            "text": text[:1000]
+        } for resume_id, filename, text in zip(ids, filenames, texts)]
+        _append_rows(added)
+        _maybe_promote_index()
+        _mark_dirty(added)
 
 def search_resumes(query_embedding: np.ndarray, top_k: int = 10, min_score: float = MIN_SCORE):
     """
-    Search resumes using semantic similarity.
+    Search resumes using cosine similarity.
     Only returns results with score >= min_score.
-    
-    Score guide:
+
+    Score guide (cosine similarity):
     - 0.5+ = Highly relevant
-    - 0.4-0.5 = Relevant  
-    - 0.3-0.4 = Somewhat relevant
-    - <0.4 = Not shown (filtered out)
+    - 0.35-0.5 = Relevant
+    - 0.25-0.35 = Somewhat relevant
+    - <0.25 = Not shown (filtered out)
     """
-    index = _get_index()
-    meta = _get_meta()
-
-    if index.ntotal == 0:
-        return []
-
-    vec = np.array([query_embedding], dtype=np.float32)
-    # Search more to filter properly
-    search_k = min(top_k * 5, index.ntotal)
-    distances, indices = index.search(vec, search_k)
-
-    results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        if idx < len(meta):
-            score = round(float(1 / (1 + dist)), 4)
-            
-            # Only include if meets minimum threshold
-            if score >= min_score:
-                entry = meta[idx].copy()
-                entry["score"] = score
-                results.append(entry)
-            
-            # Stop once we have enough
-            if len(results) >= top_k:
-                break
-
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results
+    with _lock:
+        index = _get_search_index()
+        _load_meta()
+
+        if index.ntotal == 0:
+            return []
+
+        vec = np.array([query_embedding], dtype=np.float32)
+        # Vectors are normalized, so inner product is cosine similarity
+        # and results come back already sorted by score
+        k = min(top_k, index.ntotal)
+        if index is _gpu_index:
+            k = min(k + _gpu_removed, index.ntotal, GPU_MAX_K)
+        scores, ids = index.search(vec, k)
+        # Round in float64 so scores serialize as e.g. 0.047, not 0.04699999839
+        scores = np.round(scores[0].astype(np.float64), 4)
+        ids = ids[0]
+
+        # Only include hits that meet the minimum threshold
+        keep = (ids >= 0) & (scores >= min_score)
+        scores, ids = scores[keep], ids[keep]
+        rows = np.searchsorted(_ids[:_n], ids)
+        found = (rows < _n) & (_ids[np.minimum(rows, max(_n - 1, 0))] == ids)
+
+        results = _entries(rows[found][:top_k])
+        for entry, score in zip(results, scores[found]):
+            entry["score"] = float(score)
+        return results
 
 def get_all_resumes():
-    return _get_meta()
+    with _lock:
+        _load_meta()
+        return _entries()
 
 def delete_resume(filename: str):
-    global _index, _meta
-    meta = _get_meta()
-    new_meta = [m for m in meta if m["filename"] != filename]
+    global _n
+    with _lock:
+        _load_meta()
+        mask = _filenames[:_n] == filename
 
-    if len(new_meta) == len(meta):
-        return False
+        if not mask.any():
+            return False
 
-    from embedder import embed_text
-    _index = faiss.IndexFlatL2(DIMENSION)
-    _meta = []
+        _get_index().remove_ids(faiss.IDSelectorBatch(_ids[:_n][mask]))
+        _gpu_remove(int(mask.sum()))
+        keep = ~mask
+        kept = int(keep.sum())
+        for column in (_ids, _filenames, _texts):
+            column[:kept] = column[:_n][keep]
+            column[kept:_n] = None if column.dtype == object else 0
+        _n = kept
 
-    for i, entry in enumerate(new_meta):
-        vec = np.array([embed_text(entry["text"])], dtype=np.float32)
-        _index.add(vec)
-        entry["id"] = i
-        _meta.append(entry)
-
-    _save_index()
-    _save_meta()
-    return True
+        _mark_dirty()
+        return True
 
 def clear_all():
-    global _index, _meta
-    _index = faiss.IndexFlatL2(DIMENSION)
-    _meta = []
-    if os.path.exists(INDEX_FILE):
-        os.remove(INDEX_FILE)
-    if os.path.exists(META_FILE):
-        os.remove(META_FILE)
+    global _index, _dirty, _compact, _n, _meta_loaded
+    global _ids, _filenames, _texts
+    with _lock:
+        _index = _new_index()
+        _n = 0
+        _ids = np.empty(0, dtype=np.int64)
+        _filenames = np.empty(0, dtype=object)
+        _texts = np.empty(0, dtype=object)
+        _meta_loaded = True
+        _index_changed()
+        _pending.clear()
+        _dirty = False
+        _compact = False
+        for path in (INDEX_FILE, META_FILE, META_LOG_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        # Earlier versions cached every ingested resume's vector
+        embedding_cache.clear()